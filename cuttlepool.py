@@ -7,18 +7,52 @@ CuttlePool.
 
 __version__ = '0.10.0-dev'
 
+import collections
+import functools
 try:
     import threading
 except ImportError:
     import dummy_threading as threading
-import time
 import warnings
 import weakref
 
+try:
+    from time import monotonic as _monotonic
+except ImportError:
+    # Python 2.7 does not have a monotonic clock.
+    from time import time as _monotonic
 
+
+_FIFO = False
+_IDLE_TIMEOUT = None
 _OVERFLOW = 0
+_PING_INTERVAL = 0
+_PREFILL = 0
 _TIMEOUT = None
 
+_NORMALIZE_RESOURCE_WARNING = ('Failing to implement normalize_resource() can '
+                               'result in unwanted behavior.')
+_PING_WARNING = 'Failing to implement ping() can result in unwanted behavior.'
+
+
+def _warn_deprecated(message):
+    """
+    Raise a ``DeprecationWarning`` with ``message`` that points at the caller
+    of the deprecated name. Repeats are left to the ``warnings`` filters.
+    """
+    warnings.warn(message, DeprecationWarning, stacklevel=3)
+
+
+def _overrides(pool, name):
+    """
+    Return ``True`` if ``pool`` overrides the :class:`CuttlePool` method
+    ``name``, either in a subclass or on the instance.
+    """
+    # Compare the function underlying the bound method. Anything else, e.g.
+    # a mock set on the instance, is an override.
+    method = getattr(getattr(pool, name), '__func__', None)
+    return method is not CuttlePool.__dict__[name]
+
 
 class CuttlePool(object):
     """
@@ -31,19 +65,44 @@ class CuttlePool(object):
     :param int timeout: Time in seconds to wait for a resource. Defaults to
         ``None``.
     :param resource_wrapper: A Resource subclass.
+    :param int prefill: The number of resource instances to create when the
+        pool is instantiated. Defaults to ``0``.
+    :param ping_interval: Resources that were returned to the pool less than
+        ``ping_interval`` seconds ago are not pinged when they are retrieved.
+        Defaults to ``0``, which pings every resource.
+    :type ping_interval: int or float
+    :param idle_timeout: Resources that sat in the pool for at least
+        ``idle_timeout`` seconds are discarded and replaced when they are
+        retrieved. Defaults to ``None``, which never discards idle resources.
+    :type idle_timeout: int or float
+    :param bool fifo: Retrieve resources in first in, first out order. By
+        default the most recently returned resource is retrieved first.
+        Defaults to ``False``.
     :param \**kwargs: Keyword arguments that are passed to ``factory`` when
         a resource instance is created.
 
-    :raises ValueError: If capacity <= 0 or overflow < 0 or timeout < 0.
+    :raises ValueError: If capacity <= 0 or overflow < 0 or timeout < 0 or
+        prefill is not between 0 and capacity or ping_interval < 0 or
+        idle_timeout <= 0.
     :raises TypeError: If timeout is not int or ``None``.
     """
 
+    # The default normalize_resource() and ping() are not called by
+    # get_resource(), but they warn only once per pool when a subclass calls
+    # them through super().
+    _normalize_resource_warned = False
+    _ping_warned = False
+
     def __init__(self,
                  factory,
                  capacity,
                  overflow=_OVERFLOW,
                  timeout=_TIMEOUT,
                  resource_wrapper=None,
+                 prefill=_PREFILL,
+                 ping_interval=_PING_INTERVAL,
+                 idle_timeout=_IDLE_TIMEOUT,
+                 fifo=_FIFO,
                  **kwargs):
         if capacity <= 0:
             raise ValueError('CuttlePool requires a minimum capacity of 1')
@@ -55,32 +114,69 @@ class CuttlePool(object):
                 raise TypeError(msg)
             if timeout < 0:
                 raise ValueError(msg)
+        if not 0 <= prefill <= capacity:
+            raise ValueError('Prefill must be between 0 and capacity')
+        if ping_interval < 0:
+            raise ValueError('Ping interval must be non negative')
+        if idle_timeout is not None and idle_timeout <= 0:
+            raise ValueError('Idle timeout must be positive')
 
         self._capacity = capacity
         self._overflow = overflow
+        self._maxsize = capacity + overflow
         self._timeout = timeout
+        self._ping_interval = ping_interval
+        self._idle_timeout = idle_timeout
+        self._fifo = fifo
 
         self._factory = factory
+        # Bind the factory arguments once rather than unpacking them every
+        # time a resource is made.
+        self._bound_factory = functools.partial(factory, **kwargs)
         self._resource_wrapper = resource_wrapper or Resource
         self._factory_arguments = kwargs
 
-        # The reference queue is divided in two sections. One section is a
-        # queue of resources that are ready for use (the available region).
-        # The other section is an unordered list of resources that are
-        # currently in use and NoneType objects (the unavailable region).
-        self._reference_queue = [None] * self.maxsize
-        self._resource_start = self._resource_end = 0
-        # _size is the number of existing resources. _available is the
-        # number of available resources.
-        self._size = self._available = 0
+        # The default normalize_resource() and ping() do nothing, so they are
+        # not called when retrieving a resource. Warn about them here
+        # instead.
+        if not (_overrides(self, 'normalize_resource') or
+                _overrides(self, 'normalize_connection')):
+            warnings.warn(_NORMALIZE_RESOURCE_WARNING)
+        if not _overrides(self, 'ping'):
+            warnings.warn(_PING_WARNING)
+
+        # Trackers of resources that are ready for use. Resources are
+        # returned to the right and taken from the right (last in, first out)
+        # unless fifo is set, in which case they are taken from the left.
+        self._idle = collections.deque()
+        # Trackers of resources that are currently in use, including trackers
+        # whose resource is still being made.
+        self._in_use = set()
+        # Maps the id of each resource to its tracker so a resource can be
+        # looked up without scanning the reference queue.
+        self._trackers = {}
+        # Weak references to resource wrappers that were garbage collected.
+        # The weak reference callback appends to this queue so lost resources
+        # can be returned to the pool without scanning every tracker.
+        self._lost = collections.deque()
+        # The number of existing resources.
+        self._size = 0
 
         # Required for locking the resource pool in multi-threaded
-        # environments.
-        self._lock = threading.RLock()
+        # environments. The lock is not reentrant, so methods that expect it
+        # to be held by the caller must not acquire it.
+        self._lock = threading.Lock()
         # Notify thread waiting for resource that the queue is not empty when
         # a resource is returned to the pool.
         self._not_empty = threading.Condition(self._lock)
 
+        # Create resources up front so the cost of the factory is paid when
+        # the pool is made rather than on the first calls to get_resource().
+        for _ in range(prefill):
+            rtracker = self._make_tracker()
+            with self._lock:
+                self._put(rtracker)
+
     @property
     def capacity(self):
         """
@@ -91,9 +187,8 @@ class CuttlePool(object):
     @property
     def connection_arguments(self):
         """For compatibility with older versions, will be removed in 1.0."""
-        warnings.warn(('connection_arguments is deprecated in favor of '
-                       'factory_arguments and will be removed in 1.0'),
-                      DeprecationWarning)
+        _warn_deprecated('connection_arguments is deprecated in favor of '
+                         'factory_arguments and will be removed in 1.0')
         return self.factory_arguments
 
     @property
@@ -103,13 +198,21 @@ class CuttlePool(object):
         """
         return self._factory_arguments.copy()
 
+    @property
+    def idle_timeout(self):
+        """
+        The duration a resource can sit in the pool before it is replaced on
+        retrieval.
+        """
+        return self._idle_timeout
+
     @property
     def maxsize(self):
         """
         The maximum possible number of resource instances that can exist at any
         one time.
         """
-        return self._capacity + self._overflow
+        return self._maxsize
 
     @property
     def overflow(self):
@@ -119,6 +222,14 @@ class CuttlePool(object):
         """
         return self._overflow
 
+    @property
+    def ping_interval(self):
+        """
+        The duration a resource can sit in the pool before it is pinged on
+        retrieval.
+        """
+        return self._ping_interval
+
     @property
     def size(self):
         """
@@ -132,8 +243,9 @@ class CuttlePool(object):
         .. warning:: This is not threadsafe. ``size`` can change when context
                      switches to another thread.
         """
-        with self._lock:
-            return self._size
+        # Reading an attribute is atomic, the lock would not make the value
+        # any less stale.
+        return self._size
 
     @property
     def timeout(self):
@@ -143,42 +255,30 @@ class CuttlePool(object):
         """
         return self._timeout
 
-    def _get(self, timeout, resource_wrapper=None):
+    def _create_resource(self, rtracker):
         """
-        Get a resource from the pool. If timeout is ``None`` waits
-        indefinitely.
+        Create a resource instance for ``rtracker``, replacing any resource it
+        was tracking. The pool lock must not be held by the caller, since
+        ``factory`` may block for a long time.
 
-        :param timeout: Time in seconds to wait for a resource.
-        :type timeout: int
-        :param resource_wrapper: A Resource subclass.
-        :return: A tuple containing a ``_ResourceTracker`` and ``Resource``.
-
-        :raises PoolEmptyError: When timeout has elapsed and unable to
-            retrieve resource.
+        :param rtracker: A resource tracker that is in use.
+        :type rtracker: :class:`_ResourceTracker`
         """
-        if resource_wrapper is None:
-            resource_wrapper = self._resource_wrapper
-
         with self._lock:
-            if timeout is None:
-                while self.empty():
-                    self._not_empty.wait()
-            else:
-                time_end = time.time() + timeout
-                while self.empty():
-                    time_left = time_end - time.time()
-                    if time_left < 0:
-                        raise PoolEmptyError
-
-                    self._not_empty.wait(time_left)
+            self._untrack(rtracker)
 
-            rtracker = self._reference_queue[self._resource_start]
-            self._resource_start = (self._resource_start + 1) % self.maxsize
-            self._available -= 1
-
-            wrapped_resource = rtracker.wrap_resource(self, resource_wrapper)
+        try:
+            resource = self._bound_factory()
+        except Exception:
+            # Give up the space held by rtracker.
+            with self._lock:
+                self._remove(rtracker)
+            raise
 
-            return rtracker, wrapped_resource
+        with self._lock:
+            rtracker.resource = resource
+            rtracker.last_returned = None
+            self._trackers[id(resource)] = rtracker
 
     def _get_tracker(self, resource):
         """
@@ -188,49 +288,55 @@ class CuttlePool(object):
         :return: A resource tracker.
         :rtype: :class:`_ResourceTracker`
         """
-        with self._lock:
-            for rt in self._reference_queue:
-                if rt is not None and resource is rt.resource:
-                    return rt
+        rt = self._trackers.get(id(resource))
+        if rt is None:
+            raise UnknownResourceError('Resource not created by pool')
 
-        raise UnknownResourceError('Resource not created by pool')
+        return rt
 
     def _harvest_lost_resources(self):
         """Return lost resources to pool."""
         with self._lock:
-            for i in self._unavailable_range():
-                rtracker = self._reference_queue[i]
-                if rtracker is not None and rtracker.available():
-                    self.put_resource(rtracker.resource)
+            while self._lost:
+                ref = self._lost.popleft()
+                rtracker = self._trackers.get(ref.key)
+                # Only the most recent wrapper of a resource that has not been
+                # returned to the pool counts as lost.
+                if rtracker is not None and rtracker._weakref is ref:
+                    self._release(rtracker)
 
-    def _make_resource(self, resource_wrapper=None):
+    def _make_tracker(self):
         """
-        Returns a resource instance.
+        Create a resource instance and track it as in use.
 
-        :param resource_wrapper: A Resource subclass.
-        :return: A tuple containing a ``_ResourceTracker`` and ``Resource``.
-        """
-        if resource_wrapper is None:
-            resource_wrapper = self._resource_wrapper
+        :return: A resource tracker.
+        :rtype: :class:`_ResourceTracker`
 
+        :raises PoolFullError: If there is no space for another resource.
+        """
         with self._lock:
-            for i in self._unavailable_range():
-                if self._reference_queue[i] is None:
-                    rtracker = _ResourceTracker(
-                        self._factory(**self._factory_arguments))
-
-                    self._reference_queue[i] = rtracker
-                    self._size += 1
-                    # tell the resource-tracker to wrap the resource. We return the resource-tracker an the wrapped resource
-                    wrapped_resource = rtracker.wrap_resource(
-                        self, resource_wrapper)
-                    return rtracker, wrapped_resource
+            rtracker = self._reserve_tracker()
+        self._create_resource(rtracker)
+        return rtracker
 
-            raise PoolFullError
+    def _pop(self):
+        """
+        Take a resource tracker from the idle resources. The pool lock must be
+        held and the pool must not be empty.
+
+        :return: A resource tracker.
+        :rtype: :class:`_ResourceTracker`
+        """
+        if self._fifo:
+            rtracker = self._idle.popleft()
+        else:
+            rtracker = self._idle.pop()
+        self._in_use.add(rtracker)
+        return rtracker
 
     def _put(self, rtracker):
         """
-        Put a resource back in the queue.
+        Put a resource back in the queue. The pool lock must be held.
 
         :param rtracker: A resource.
         :type rtracker: :class:`_ResourceTracker`
@@ -238,63 +344,122 @@ class CuttlePool(object):
         :raises PoolFullError: If pool is full.
         :raises UnknownResourceError: If resource can't be found.
         """
-        with self._lock:
-            if self._available < self.capacity:
-                for i in self._unavailable_range():
-                    if self._reference_queue[i] is rtracker:
-                        # i retains its value and will be used to swap with
-                        # first "empty" space in queue.
-                        break
-                else:
-                    raise UnknownResourceError
-
-                j = self._resource_end
-                rq = self._reference_queue
-                rq[i], rq[j] = rq[j], rq[i]
-
-                self._resource_end = (self._resource_end + 1) % self.maxsize
-                self._available += 1
-
-                self._not_empty.notify()
-            else:
-                raise PoolFullError
+        if len(self._idle) < self._capacity:
+            if rtracker not in self._in_use:
+                raise UnknownResourceError
+
+            self._in_use.remove(rtracker)
+            self._idle.append(rtracker)
+            # The resource is back in the pool, so its wrapper is no longer
+            # tracked.
+            rtracker._weakref = None
+            rtracker.last_returned = _monotonic()
+
+            # Wake exactly one waiter for the one resource returned. Waking
+            # all waiters would only send the rest back to sleep. Code that
+            # returns several resources at once should call notify(n).
+            self._not_empty.notify()
+        else:
+            raise PoolFullError
+
+    def _release(self, rtracker):
+        """
+        Return a resource to the pool or discard it if the pool is full. The
+        pool lock must be held.
+
+        :param rtracker: A resource tracker.
+        :type rtracker: :class:`_ResourceTracker`
+
+        :raises UnknownResourceError: If the resource is not in use.
+        """
+        if rtracker not in self._in_use:
+            raise UnknownResourceError
+
+        if len(self._idle) < self._capacity:
+            self._put(rtracker)
+        else:
+            # The pool is full, so discard the resource.
+            self._remove(rtracker)
 
     def _remove(self, rtracker):
         """
-        Remove a resource from the pool.
+        Remove a resource from the pool. The pool lock must be held.
 
         :param rtracker: A resource.
         :type rtracker: :class:`_ResourceTracker`
         """
-        with self._lock:
-            i = self._reference_queue.index(rtracker)
-            self._reference_queue[i] = None
-            self._size -= 1
+        self._in_use.remove(rtracker)
+        self._untrack(rtracker)
+        self._size -= 1
+        # There is space to make a resource, which a waiter can use.
+        self._not_empty.notify()
+
+    def _reserve_tracker(self):
+        """
+        Reserve space for a new resource. The returned tracker has no resource
+        until :meth:`_create_resource` is called. The pool lock must be held.
 
-    def _unavailable_range(self):
+        :return: A resource tracker.
+        :rtype: :class:`_ResourceTracker`
+
+        :raises PoolFullError: If there is no space for another resource.
         """
-        Return a generator for the indices of the unavailable region of
-        ``_reference_queue``.
+        if self._size >= self._maxsize:
+            raise PoolFullError
+
+        rtracker = _ResourceTracker(None)
+        self._in_use.add(rtracker)
+        self._size += 1
+        return rtracker
+
+    def _untrack(self, rtracker):
         """
-        with self._lock:
-            i = self._resource_end
-            j = self._resource_start
-            if j < i or self.empty():
-                j += self.maxsize
+        Stop looking up ``rtracker`` by its resource. The pool lock must be
+        held.
+
+        :param rtracker: A resource tracker.
+        :type rtracker: :class:`_ResourceTracker`
+        """
+        key = id(rtracker.resource)
+        if self._trackers.get(key) is rtracker:
+            del self._trackers[key]
+
+    def _wait(self, timeout):
+        """
+        Wait for a resource to be returned to the pool or for space to make
+        one. If timeout is ``None`` waits indefinitely. The pool lock must be
+        held.
+
+        :param timeout: Time in seconds to wait for a resource.
+        :type timeout: int
+
+        :raises PoolEmptyError: When timeout has elapsed and the pool is
+            still empty.
+        """
+        def waiting():
+            return not self._idle and self._size >= self._maxsize
+
+        if timeout is None:
+            while waiting():
+                self._not_empty.wait()
+        else:
+            time_end = _monotonic() + timeout
+            while waiting():
+                time_left = time_end - _monotonic()
+                if time_left < 0:
+                    raise PoolEmptyError
 
-            for k in range(i, j):
-                yield k % self.maxsize
+                self._not_empty.wait(time_left)
 
     def empty(self):
         """Return ``True`` if pool is empty."""
         with self._lock:
-            return self._available == 0
+            return not self._idle
 
     def get_connection(self, connection_wrapper=None):
         """For compatibility with older versions, will be removed in 1.0."""
-        warnings.warn(('get_connection() is deprecated in favor of '
-                       'get_resource() and will be removed in 1.0'),
-                      DeprecationWarning)
+        _warn_deprecated('get_connection() is deprecated in favor of '
+                         'get_resource() and will be removed in 1.0')
         return self.get_resource(connection_wrapper)
 
     def get_resource(self, resource_wrapper=None):
@@ -307,67 +472,81 @@ class CuttlePool(object):
         :raises PoolEmptyError: If attempt to get resource fails or times
             out.
         """
-        rtracker = None
-        wrapped_resource = None
-
         if resource_wrapper is None:
             resource_wrapper = self._resource_wrapper
 
-        if self.empty():
+        if self._lost:
             self._harvest_lost_resources()
 
+        # Hold the lock once to decide how to get the resource rather than
+        # acquiring it separately in each helper. This also prevents another
+        # thread from taking the slot that was just found to be free.
+        with self._lock:
+            if not self._idle and self._size >= self._maxsize:
+                # Could not find or make resource, so must wait for a
+                # resource to be returned to the pool or for space to make
+                # one. Raises PoolEmptyError on timeout.
+                self._wait(self._timeout)
+
+            if self._idle:
+                rtracker = self._pop()
+                make = False
+            else:
+                # Could not find resource, reserve space to make one.
+                rtracker = self._reserve_tracker()
+                make = True
+
+        if make:
+            # Make the resource without holding the lock, so other threads
+            # are not blocked while the factory runs.
+            self._create_resource(rtracker)
+
+        # Ensure resource is active. A resource that sat in the pool for
+        # idle_timeout seconds is replaced. A resource that was returned to
+        # the pool less than ping_interval seconds ago is assumed to be
+        # active.
+        idle = rtracker.idle_time()
+        if (idle is not None and self._idle_timeout is not None and
+                idle >= self._idle_timeout):
+            active = False
+        elif (idle is None or idle >= self._ping_interval) and \
+                _overrides(self, 'ping'):
+            active = self.ping(rtracker.resource)
+        else:
+            active = True
+
+        if not active:
+            # Replace the resource. The tracker stays in use, which ensures
+            # there is space for the new resource.
+            self._create_resource(rtracker)
+
+        # The wrapper is user code, so it is made without holding the lock.
+        # The tracker is already in use, so no other thread can take it.
         try:
-            # Try to get a resource from the pool. Do not wait.
-            rtracker, wrapped_resource = self._get(0, resource_wrapper)
-        except PoolEmptyError:
-            pass
-
-        if rtracker is None:
-            # Could not find resource, try to make one.
-            try:
-                rtracker, wrapped_resource = self._make_resource(
-                    resource_wrapper)
-            except PoolFullError:
-                pass
-
-        if rtracker is None:
-            # Could not find or make resource, so must wait for a resource
-            # to be returned to the pool.
-            try:
-                rtracker, wrapped_resource = self._get(
-                    self._timeout, resource_wrapper)
-            except PoolEmptyError:
-                pass
-
-        if rtracker is None:
-            raise PoolEmptyError
-
-        # Ensure resource is active.
-        if not self.ping(rtracker.resource):
-            # Lock here to prevent another thread creating a resource in the
-            # index that will have this resource removed. This ensures there
-            # will be space for _make_resource() to place a newly created
-            # resource.
+            wrapped_resource = rtracker.wrap_resource(self, resource_wrapper)
+        except BaseException:
+            # There is no wrapper to return the resource when it is garbage
+            # collected, so return it now.
             with self._lock:
-                self._remove(rtracker)
-                rtracker, wrapped_resource = self._make_resource(
-                    resource_wrapper)
+                self._release(rtracker)
+            raise
 
         # Ensure all resources leave pool with same attributes.
-        # normalize_connection() is used since it calls
-        # normalize_resource(), so if a user implements either one, the
-        # resource will still be normalized. This will be changed in 1.0 to
-        # call normalize_resource() when normalize_connection() is
-        # removed.
-        self.normalize_connection(rtracker.resource)
+        # normalize_connection() is only used if it is overridden, otherwise
+        # normalize_resource() is called directly without going through the
+        # deprecation warning. This will be removed in 1.0 along with
+        # normalize_connection().
+        if _overrides(self, 'normalize_connection'):
+            self.normalize_connection(rtracker.resource)
+        elif _overrides(self, 'normalize_resource'):
+            self.normalize_resource(rtracker.resource)
 
         return wrapped_resource
 
     def normalize_connection(self, connection):
         """For compatibility with older versions, will be removed in 1.0."""
-        warnings.warn(('normalize_connection is deprecated in favor of '
-                       'normalize_resource and will be removed in 1.0'),
-                      DeprecationWarning)
+        _warn_deprecated('normalize_connection is deprecated in favor of '
+                         'normalize_resource and will be removed in 1.0')
         return self.normalize_resource(connection)
 
     def normalize_resource(self, resource):
@@ -378,9 +557,14 @@ class CuttlePool(object):
         have been changed when previously used.
 
         :param obj resource: A resource instance.
+
+        :note: This is called without holding the pool lock. It may block, and
+            it does not need a lock of its own since only the calling thread
+            has the resource.
         """
-        warnings.warn('Failing to implement normalize_resource() can '
-                      'result in unwanted behavior.')
+        if not self._normalize_resource_warned:
+            self._normalize_resource_warned = True
+            warnings.warn(_NORMALIZE_RESOURCE_WARNING)
 
     def ping(self, resource):
         """
@@ -391,16 +575,20 @@ class CuttlePool(object):
 
         :return: A bool indicating if the resource is open (``True``) or
             closed (``False``).
+
+        :note: This is called without holding the pool lock. It may block, and
+            it does not need a lock of its own since only the calling thread
+            has the resource.
         """
-        warnings.warn('Failing to implement ping() can result in unwanted '
-                      'behavior.')
+        if not self._ping_warned:
+            self._ping_warned = True
+            warnings.warn(_PING_WARNING)
         return True
 
     def put_connection(self, connection):
         """For compatibility with older versions, will be removed in 1.0."""
-        warnings.warn(('put_connection is deprecated in favor of '
-                       'put_resource and will be removed in 1.0'),
-                      DeprecationWarning)
+        _warn_deprecated('put_connection is deprecated in favor of '
+                         'put_resource and will be removed in 1.0')
         return self.put_resource(connection)
 
     def put_resource(self, resource):
@@ -412,12 +600,8 @@ class CuttlePool(object):
         :raises UnknownResourceError: If resource was not made by the
                                         pool.
         """
-        rtracker = self._get_tracker(resource)
-
-        try:
-            self._put(rtracker)
-        except PoolFullError:
-            self._remove(rtracker)
+        with self._lock:
+            self._release(self._get_tracker(resource))
 
 
 class _ResourceTracker(object):
@@ -427,13 +611,22 @@ class _ResourceTracker(object):
     :param resource: A resource instance.
     """
 
+    __slots__ = ('resource', '_weakref', 'last_returned')
+
     def __init__(self, resource):
         self.resource = resource
         self._weakref = None
+        # The time the resource was last returned to the pool.
+        self.last_returned = None
 
-    def available(self):
-        """Determine if resource available for use."""
-        return self._weakref is None or self._weakref() is None
+    def idle_time(self):
+        """
+        Return the time in seconds since the resource was last returned to the
+        pool, or ``None`` if it has never been returned.
+        """
+        if self.last_returned is None:
+            return None
+        return _monotonic() - self.last_returned
 
     def wrap_resource(self, pool, resource_wrapper):
         """
@@ -447,18 +640,49 @@ class _ResourceTracker(object):
         :rtype: :class:`Resource`
         """
         resource = resource_wrapper(self.resource, pool)
-        self._weakref = weakref.ref(resource)
+        self._weakref = _ResourceRef(resource, pool._lost.append,
+                                     id(self.resource))
         return resource
 
 
+class _ResourceRef(weakref.ref):
+    """
+    A weak reference to a resource wrapper.
+
+    :param wrapper: A wrapped resource.
+    :param callback: Called with the weak reference when ``wrapper`` is
+        garbage collected.
+    :param key: The id of the resource instance that is wrapped.
+    """
+
+    __slots__ = ('key', )
+
+    def __new__(cls, wrapper, callback, key):
+        self = weakref.ref.__new__(cls, wrapper, callback)
+        self.key = key
+        return self
+
+    def __init__(self, wrapper, callback, key):
+        super(_ResourceRef, self).__init__(wrapper, callback)
+
+
 class Resource(object):
     """
     A wrapper around a resource instance.
 
     :param resource: A resource instance.
     :param pool: A resource pool.
+
+    :note: Attributes are set on the resource instance unless they are
+        listed in ``_wrapper_attributes`` or already set on the wrapper.
+        Subclasses that store their own attributes on the wrapper should
+        extend it or set them with ``object.__setattr__()``.
     """
 
+    __slots__ = ('_resource', '_pool', '__weakref__')
+
+    _wrapper_attributes = frozenset(('_resource', '_pool'))
+
     def __init__(self, resource, pool):
         object.__setattr__(self, '_resource', resource)
         object.__setattr__(self, '_pool', pool)
@@ -473,23 +697,36 @@ class Resource(object):
         """
         Gets attributes of resource object.
         """
+        # __getattr__ is only called for _resource if it is not set (e.g. the
+        # wrapper was made with __new__), raise instead of recursing.
+        if name == '_resource':
+            raise AttributeError(name)
         return getattr(self._resource, name)
 
     def __setattr__(self, name, value):
         """Sets attributes of resource object."""
-        if name not in self.__dict__:
-            setattr(self._resource, name, value)
-        else:
+        # Only subclasses without __slots__ have an instance dictionary. Look
+        # it up directly, otherwise __getattr__ would return the dictionary
+        # of the resource instance.
+        if (name in self._wrapper_attributes or
+                type(self).__dictoffset__ and
+                name in object.__getattribute__(self, '__dict__')):
             object.__setattr__(self, name, value)
+        else:
+            setattr(self._resource, name, value)
 
     def close(self):
         """
         Returns the resource to the resource pool.
         """
-        if self._resource is not None:
-            self._pool.put_resource(self._resource)
-            self._resource = None
-            self._pool = None
+        resource = self._resource
+        if resource is None:
+            return
+
+        self._pool.put_resource(resource)
+        # Bypass __setattr__, these are known to be wrapper attributes.
+        object.__setattr__(self, '_resource', None)
+        object.__setattr__(self, '_pool', None)
 
 
 class CuttlePoolError(Exception):
@@ -514,7 +751,9 @@ class UnknownResourceError(CuttlePoolError):
 class PoolConnection(Resource):
     """For compatibility with older versions, will be removed in 1.0."""
 
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
-        warnings.warn(('PoolConnection is deprecated in favor of Resource and '
-                       'will be removed in 1.0'), DeprecationWarning)
+        _warn_deprecated('PoolConnection is deprecated in favor of Resource '
+                         'and will be removed in 1.0')
         super(PoolConnection, self).__init__(*args, **kwargs)
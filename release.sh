@@ -99,17 +99,9 @@ function git_push_tag {
 function prepare_development {
     echo -e "prepare_development\t$1\t$2" > $RESUME
     DEV_VERSION=$(new_version $1 $2)
-    # Update changelog.
-    sed -i "/## \[$2\]/i## \[$UNRELEASED\]\n" CHANGELOG.md
-    if [ $? -ne 0 ]
-    then
-	git checkout HEAD -- CHANGELOG.md
-	echo "release: Problem updating CHANGELOG.md for development." >&2
-	exit 1
-    fi
-
-    # Update version compare link.
-    sed -i "/\[$2\]:/i\[$UNRELEASED\]: https:\/\/github\.com\/smitchell556\/cuttlepool\/compare\/v${2}\.\.\.HEAD" CHANGELOG.md
+    # Update changelog and version compare link in one pass.
+    sed -i -e "/## \[$2\]/i## \[$UNRELEASED\]\n" \
+	   -e "/\[$2\]:/i\[$UNRELEASED\]: https:\/\/github\.com\/smitchell556\/cuttlepool\/compare\/v${2}\.\.\.HEAD" CHANGELOG.md
     if [ $? -ne 0 ]
     then
 	git checkout HEAD -- CHANGELOG.md
@@ -118,7 +110,7 @@ function prepare_development {
     fi
 
     # Update version.
-    sed -i "s/$2/$DEV_VERSION/" cuttlepool.py
+    sed -i "/^__version__ = /s/$2/$DEV_VERSION/" cuttlepool.py
     if [ $? -ne 0 ]
     then
 	git checkout HEAD -- CHANGELOG.md cuttlepool.py
@@ -195,25 +187,10 @@ VERSION=${DEV_VERSION%.*}
 
 # Begin release process.
 
-# Update changelog unreleased header.
-sed -i "s/## \[$UNRELEASED\]/## \[$VERSION\] - $DATE/" CHANGELOG.md
-if [ $? -ne 0 ]
-then
-    git checkout HEAD -- CHANGELOG.md
-    echo "release: Problem updating CHANGELOG.md." >&2
-    exit 1
-fi
-
-# Update version compare link.
-sed -i "s/\[$UNRELEASED\]/\[$VERSION\]/" CHANGELOG.md
-if [ $? -ne 0 ]
-then
-    git checkout HEAD -- CHANGELOG.md
-    echo "release: Problem updating CHANGELOG.md." >&2
-    exit 1
-fi
-
-sed -i "s/...HEAD/...v$VERSION/" CHANGELOG.md
+# Update changelog unreleased header and version compare link in one pass.
+sed -i -e "s/## \[$UNRELEASED\]/## \[$VERSION\] - $DATE/" \
+       -e "s/\[$UNRELEASED\]/\[$VERSION\]/" \
+       -e "s/...HEAD/...v$VERSION/" CHANGELOG.md
 if [ $? -ne 0 ]
 then
     git checkout HEAD -- CHANGELOG.md
@@ -222,7 +199,7 @@ then
 fi
 
 # Update version.
-sed -i "s/${VERSION}-dev/$VERSION/" cuttlepool.py
+sed -i "/^__version__ = /s/${VERSION}-dev/$VERSION/" cuttlepool.py
 if [ $? -ne 0 ]
 then
     git checkout HEAD -- CHANGELOG.md cuttlepool.py
@@ -5,13 +5,13 @@ import re
 from setuptools import setup
 
 
-VER_RE = "__version__ = [\"'](?P<Version>(?:(?![\"']).)*)"
+VER_RE = re.compile("__version__ = [\"'](?P<Version>(?:(?![\"']).)*)")
 
 here = os.path.abspath(os.path.dirname(__file__))
 
-with io.open(os.path.join(os.getcwd(), 'cuttlepool.py'), 'r', encoding='utf-8') as f:
+with io.open(os.path.join(here, 'cuttlepool.py'), 'r', encoding='utf-8') as f:
     init_file = f.read()
-    version = re.search(VER_RE, init_file).group('Version')
+    version = VER_RE.search(init_file).group('Version')
 
 with io.open(os.path.join(here, 'README.rst'), 'r', encoding='utf-8') as f:
     long_description = f.read()
@@ -41,5 +41,5 @@ setup(name='cuttlepool',
       py_modules=['cuttlepool'],
       include_package_data=True,
       extras_require={
-          'dev': ['pytest']
+          'dev': ['pytest>=3.0']
       })
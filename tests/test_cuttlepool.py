@@ -4,18 +4,13 @@ CuttlePool tests.
 """
 import gc
 import threading
-import time
+import warnings
 
 import pytest
 
-# Travis CI uses pytest v2.9.2 for Python 3.3 tests. Any fixtures that yield
-# a resource using pytest <= v2.9.2 should use yield_fixture explicitly,
-# otherwise use fixture as per the docs.
-if int(pytest.__version__.split('.')[0]) >= 3:
-    pytest.yield_fixture = pytest.fixture
-
-from cuttlepool import (_ResourceTracker, CuttlePool, Resource, PoolEmptyError,
-                        PoolFullError)
+from cuttlepool import (_ResourceTracker, CuttlePool, PoolConnection,
+                        Resource, PoolEmptyError, PoolFullError,
+                        UnknownResourceError)
 import mockresource
 
 
@@ -31,6 +26,23 @@ class SubResource(Resource):
     pass
 
 
+def watch_waiters(pool):
+    """
+    Return an event that is set when a thread waits for a resource from
+    ``pool``. The waiting thread holds the pool lock when the event is set,
+    so anything that needs the lock runs after the thread is waiting.
+    """
+    waiting = threading.Event()
+    wait = pool._not_empty.wait
+
+    def wait_and_signal(*args):
+        waiting.set()
+        return wait(*args)
+
+    pool._not_empty.wait = wait_and_signal
+    return waiting
+
+
 @pytest.fixture
 def capacity():
     return 5
@@ -51,11 +63,10 @@ def pool(capacity, overflow):
 @pytest.fixture
 def rtracker(pool):
     """A _ResourceTracker instance."""
-    rt, _ = pool._make_resource()
-    return rt
+    return pool._make_tracker()
 
 
-@pytest.yield_fixture
+@pytest.fixture
 def resource(pool):
     """A Resource instance."""
     r = pool.get_resource()
@@ -63,25 +74,27 @@ def resource(pool):
     r.close()
 
 
-def test_nonpositive_capacity():
-    """Test error is raised when nonpositive capacity is specified."""
-    with pytest.raises(ValueError):
-        MockPool(mockresource.factory, capacity=0)
-
-
-def test_negative_overflow():
-    """Test error is raised when negative overflow is specified."""
-    with pytest.raises(ValueError):
-        MockPool(mockresource.factory, capacity=1, overflow=-1)
+@pytest.mark.parametrize('kwargs, error', [
+    ({'capacity': 0}, ValueError),
+    ({'capacity': 1, 'overflow': -1}, ValueError),
+    ({'capacity': 1, 'timeout': -1}, ValueError),
+    ({'capacity': 1, 'timeout': -0.1}, TypeError),
+    ({'capacity': 1, 'prefill': -1}, ValueError),
+    ({'capacity': 1, 'prefill': 2}, ValueError),
+    ({'capacity': 1, 'ping_interval': -1}, ValueError),
+    ({'capacity': 1, 'idle_timeout': 0}, ValueError),
+])
+def test_improper_arguments(kwargs, error):
+    """Test error is raised for improper pool arguments."""
+    with pytest.raises(error):
+        MockPool(mockresource.factory, **kwargs)
 
 
-def test_improper_timeout():
-    """Test error is raised for improper timeout argument."""
-    with pytest.raises(ValueError):
-        MockPool(mockresource.factory, capacity=1, timeout=-1)
-
-    with pytest.raises(TypeError):
-        MockPool(mockresource.factory, capacity=1, timeout=-0.1)
+def test_prefill(capacity):
+    """Test resources are created when the pool is instantiated."""
+    pool = MockPool(mockresource.factory, capacity=capacity, prefill=capacity)
+    assert pool.size == len(pool._idle) == capacity
+    assert not pool._lost
 
 
 def test_resource_wrapper():
@@ -111,32 +124,88 @@ def test_resource_wrapper_get_resource(pool):
     assert isinstance(r, SubResource)
 
 
-def test_get_empty(pool):
-    """Test the pool raises a ``PoolEmptyError``."""
-    with pytest.raises(PoolEmptyError):
-        pool._get(0)
+def test_resource_wrapper_uses_pool(pool):
+    """Test a resource wrapper can call the pool when it is made."""
+    class PoolResource(Resource):
+        def __init__(self, resource, pool):
+            super(PoolResource, self).__init__(resource, pool)
+            pool.empty()
 
+    def get_resources():
+        # The first resource is made, the second is taken from the pool.
+        pool.get_resource(resource_wrapper=PoolResource).close()
+        pool.get_resource(resource_wrapper=PoolResource).close()
 
-def test_get(pool, resource):
-    """Test ``_get()`` gets a resource."""
-    resource.close()  # Returns resource to pool.
-    rt, _ = pool._get(0)
-    assert isinstance(rt, _ResourceTracker)
+    t = threading.Thread(target=get_resources)
+    t.daemon = True
+    t.start()
+    t.join(5)
+
+    assert not t.is_alive()
 
 
-def test_get_wait():
-    def worker(r):
-        time.sleep(5)
+def test_get_resource_wait():
+    """Test a waiting thread gets a resource once one is returned."""
+    pool = MockPool(mockresource.factory, capacity=1, timeout=10)
+    r = pool.get_resource()
+    resource = r._resource
+    waiting = watch_waiters(pool)
+
+    def worker():
+        waiting.wait(5)
         r.close()
 
-    pool = MockPool(mockresource.factory, capacity=1)
-    resource = pool.get_resource()
+    t = threading.Thread(target=worker)
+    t.start()
+
+    r2 = pool.get_resource()
+    t.join()
+    assert r2._resource is resource
+    assert waiting.is_set()
+
 
-    t = threading.Thread(target=worker, args=(resource, ))
+def test_get_resource_after_factory_error():
+    """
+    Test a waiting thread makes a resource when the factory fails in another
+    thread.
+    """
+    calls = []
+    started = threading.Event()
+    fail = threading.Event()
+
+    def factory(**kwargs):
+        calls.append(None)
+        if len(calls) == 1:
+            started.set()
+            fail.wait()
+            raise RuntimeError
+        return mockresource.factory(**kwargs)
+
+    def worker():
+        try:
+            pool.get_resource()
+        except RuntimeError:
+            pass
+
+    pool = MockPool(factory, capacity=1, timeout=10)
+    waiting = watch_waiters(pool)
+    t = threading.Thread(target=worker)
     t.start()
+    started.wait()
 
-    rt, _ = pool._get(None)
-    assert isinstance(rt, _ResourceTracker)
+    def failer():
+        waiting.wait(5)
+        fail.set()
+
+    t2 = threading.Thread(target=failer)
+    t2.start()
+    r = pool.get_resource()
+    t.join()
+    t2.join()
+
+    assert isinstance(r, Resource)
+    assert len(calls) == 2
+    assert waiting.is_set()
 
 
 def test_get_tracker(pool, rtracker):
@@ -148,29 +217,96 @@ def test_get_tracker(pool, rtracker):
 def test_harvest_lost_resources(pool):
     """Test unreferenced resources are returned to the pool."""
 
-    def get_resource_id():
+    def get_unwrapped_resource():
         """
         Ensures ``Resource`` falls out of scope before calling
         ``_harvest_lost_resources()``.
         """
-        return id(pool.get_resource()._resource)
+        return pool.get_resource()._resource
 
-    r_id = get_resource_id()
+    resource = get_unwrapped_resource()
     # Run garbage collection to ensure ``Resource`` created in
-    # ``get_resource_id()`` is destroyed.
+    # ``get_unwrapped_resource()`` is destroyed.
     gc.collect()
     pool._harvest_lost_resources()
-    assert r_id == id(pool.get_resource()._resource)
+    assert pool.get_resource()._resource is resource
 
 
-def test_make_resource(pool):
-    """
-    Test the resource object returned from _make_resource is the proper class
-    instance.
-    """
-    r, _ = pool._make_resource()
+def test_harvest_lost_resources_on_get(pool):
+    """Test lost resources are reused by ``get_resource()``."""
+    resource = pool.get_resource()._resource
+    gc.collect()
+    assert pool.get_resource()._resource is resource
+    assert pool.size == 1
+
+
+def test_harvest_ignores_closed_resources(pool):
+    """Test a closed resource is not returned to the pool twice."""
+    r = pool.get_resource()
+    r.close()
+    del r
+    gc.collect()
+    pool._harvest_lost_resources()
+    assert len(pool._idle) == 1
+
+
+def test_make_tracker(pool):
+    """Test ``_make_tracker()`` makes a resource and tracks it as in use."""
+    rt = pool._make_tracker()
     assert pool.size == 1
-    assert isinstance(r, _ResourceTracker)
+    assert isinstance(rt, _ResourceTracker)
+    assert rt in pool._in_use
+    assert not pool._lost
+
+
+def test_make_resource_unlocked():
+    """Test the factory is called without holding the pool lock."""
+    acquired = []
+
+    def worker(pool):
+        if pool._lock.acquire(False):
+            acquired.append(True)
+            pool._lock.release()
+
+    def factory(**kwargs):
+        t = threading.Thread(target=worker, args=(pool, ))
+        t.start()
+        t.join()
+        return mockresource.factory(**kwargs)
+
+    pool = MockPool(factory, capacity=1)
+    pool.get_resource()
+    assert acquired == [True]
+
+
+def test_make_resource_error():
+    """Test space is released when the factory raises an error."""
+
+    def factory(**kwargs):
+        raise RuntimeError
+
+    pool = MockPool(factory, capacity=1)
+    with pytest.raises(RuntimeError):
+        pool.get_resource()
+
+    assert pool.size == 0
+    assert not pool._in_use
+
+
+def test_resource_wrapper_error():
+    """Test the resource is returned when the resource wrapper raises."""
+    class BrokenResource(Resource):
+        def __init__(self, resource, pool):
+            raise RuntimeError
+
+    pool = MockPool(mockresource.factory, capacity=1, timeout=1)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            pool.get_resource(BrokenResource)
+
+    assert pool.size == len(pool._idle) == 1
+    assert not pool._in_use
+    pool.get_resource()
 
 
 def test_put_full():
@@ -178,55 +314,87 @@ def test_put_full():
     pool = MockPool(mockresource.factory, capacity=1, overflow=1)
     r1 = pool.get_resource()
     r2 = pool.get_resource()
-    print(pool.capacity, pool._available)
 
-    pool._put(pool._get_tracker(r1._resource))
-    with pytest.raises(PoolFullError):
-        pool._put(pool._get_tracker(r2._resource))
+    with pool._lock:
+        pool._put(pool._get_tracker(r1._resource))
+        with pytest.raises(PoolFullError):
+            pool._put(pool._get_tracker(r2._resource))
 
 
 def test_put(pool, rtracker):
     """Test ``_put()`` returns resource to pool."""
-    assert pool._available == 0
-    pool._put(rtracker)
-    assert pool._available == 1
+    assert not pool._idle
+    with pool._lock:
+        pool._put(rtracker)
+    assert list(pool._idle) == [rtracker]
+    assert rtracker not in pool._in_use
+
+
+def test_put_unknown(pool, rtracker):
+    """
+    Test ``_put()`` raises ``UnknownResourceError`` for a tracker that is not
+    in use.
+    """
+    with pool._lock:
+        with pytest.raises(UnknownResourceError):
+            pool._put(_ResourceTracker(None))
+
+        pool._put(rtracker)
+        with pytest.raises(UnknownResourceError):
+            pool._put(rtracker)
+
+
+def test_put_resource_twice():
+    """
+    Test returning a resource that is already in a full pool raises
+    ``UnknownResourceError``.
+    """
+    pool = MockPool(mockresource.factory, capacity=1)
+    resource = pool.get_resource()._resource
+    pool.put_resource(resource)
+
+    with pytest.raises(UnknownResourceError):
+        pool.put_resource(resource)
+
+    assert pool.size == len(pool._idle) == 1
 
 
 def test_remove(pool, rtracker):
     """Test ``_remove()`` removes resource from pool."""
-    pool._remove(rtracker)
-    assert pool.size == pool._available == 0
-    assert list(filter(None, pool._reference_queue)) == []
-
+    with pool._lock:
+        pool._remove(rtracker)
+    assert pool.size == len(pool._idle) == 0
+    assert not pool._in_use
 
-def test_unavailable_range(pool):
-    """Test proper generator returned for unused pool."""
-    assert list(pool._unavailable_range()) == [x for x in range(pool.maxsize)]
 
+def test_in_use(pool, capacity):
+    """Test resources are tracked as in use until they are returned."""
+    resources = [pool.get_resource() for _ in range(capacity)]
+    assert len(pool._in_use) == capacity
+    assert not pool._idle
 
-def test_unavailable_range_depleted_pool(pool):
-    """Test generator when pool is depleted."""
-    resources = [pool.get_resource() for _ in range(pool.maxsize)]
-    assert list(pool._unavailable_range()) == [x for x in range(pool.maxsize)]
+    resources.pop().close()
+    assert len(pool._in_use) == capacity - 1
+    assert len(pool._idle) == 1
 
 
-def test_unavailable_range_wraps(pool, capacity):
-    """
-    Test generator uses correct indices when ``_resource_start`` is less than
-    ``_resource_end``.
-    """
-    # Create capacity resources, then return them to the pool. This makes
-    # _resource_end == capacity.
+def test_fifo(capacity):
+    """Test resources are retrieved in the order they were returned."""
+    pool = MockPool(mockresource.factory, capacity=capacity, fifo=True)
     resources = [pool.get_resource() for _ in range(capacity)]
-    [r.close() for r in resources]
-    # Get a resource, which makes _resource_start == 1.
-    r = pool.get_resource()
+    unwrapped = [r._resource for r in resources]
+    for r in resources:
+        r.close()
+    assert pool.get_resource()._resource is unwrapped[0]
 
-    # The unavailable range starts at _resource_end (5) and wraps around to
-    # _resource_start (1, exclusive).
-    unavailable = list(range(capacity, pool.maxsize))
-    unavailable.extend(range(pool._resource_start))
-    assert list(pool._unavailable_range()) == unavailable
+
+def test_lifo(pool, capacity):
+    """Test the most recently returned resource is retrieved first."""
+    resources = [pool.get_resource() for _ in range(capacity)]
+    unwrapped = [r._resource for r in resources]
+    for r in resources:
+        r.close()
+    assert pool.get_resource()._resource is unwrapped[-1]
 
 
 def test_get_resource(pool):
@@ -257,17 +425,36 @@ def test_get_resource_overflow(pool):
 def test_get_resource_depleted(pool):
     """Test the pool will return a resource once one is available."""
 
+    acquired = threading.Semaphore(0)
+    release = threading.Event()
+    waiting = watch_waiters(pool)
+
     def worker(pool):
         r = pool.get_resource()
-        time.sleep(5)
+        acquired.release()
+        release.wait()
         r.close()
 
-    for _ in range(pool.maxsize):
-        t = threading.Thread(target=worker, args=(pool, ))
+    threads = [threading.Thread(target=worker, args=(pool, ))
+               for _ in range(pool.maxsize)]
+    for t in threads:
         t.start()
+    # Wait for every resource to be taken before trying to get another.
+    for _ in threads:
+        acquired.acquire()
+
+    def releaser():
+        waiting.wait(5)
+        release.set()
 
-    time.sleep(2)
+    t = threading.Thread(target=releaser)
+    t.start()
     r = pool.get_resource()
+    t.join()
+    for t in threads:
+        t.join()
+    assert isinstance(r, Resource)
+    assert waiting.is_set()
 
 
 def test_get_resource_depleted_error():
@@ -291,14 +478,28 @@ def test_normalize_resource():
 
     pool = Normalize(mockresource.factory, capacity=1)
     r = pool.get_resource()
-    r_id = id(r._resource)
+    resource = r._resource
     r.one = 2
     assert r.one == 2
     r.close()
 
     r2 = pool.get_resource()
-    r2_id = id(r2._resource)
-    assert (r2.one == 1 and r_id == r2_id)
+    assert (r2.one == 1 and r2._resource is resource)
+
+
+def test_normalize_connection():
+    """
+    Test that a subclass implementing the deprecated ``normalize_connection``
+    method still has it called on resources returned from get_resource.
+    """
+
+    class Normalize(MockPool):
+        def normalize_connection(self, connection):
+            setattr(connection, 'one', 1)
+
+    pool = Normalize(mockresource.factory, capacity=1)
+    r = pool.get_resource()
+    assert r.one == 1
 
 
 def test_ping(pool):
@@ -307,7 +508,7 @@ def test_ping(pool):
     from get_resource.
     """
     r = pool.get_resource()
-    r_id = id(r._resource)
+    resource = r._resource
     r._resource.close()  # Close the underlying resource object.
     r.close()  # Return the resource to the pool.
 
@@ -315,8 +516,122 @@ def test_ping(pool):
     # the previous one (which is the only one currently in the pool) is not
     # open.
     r2 = pool.get_resource()
-    r2_id = id(r2._resource)
-    assert r_id != r2_id
+    assert r2._resource is not resource
+
+
+def test_ping_interval():
+    """
+    Test that resources returned to the pool within ``ping_interval`` are not
+    pinged.
+    """
+    pool = MockPool(mockresource.factory, capacity=1, ping_interval=60)
+    r = pool.get_resource()
+    resource = r._resource
+    r._resource.close()
+    r.close()
+
+    # The resource is not open, but it was returned too recently to be
+    # pinged.
+    r2 = pool.get_resource()
+    assert r2._resource is resource
+
+
+def test_idle_timeout():
+    """
+    Test that resources that sat in the pool for ``idle_timeout`` are
+    replaced.
+    """
+    pool = MockPool(mockresource.factory, capacity=1, idle_timeout=60)
+    r = pool.get_resource()
+    resource = r._resource
+    rtracker = pool._get_tracker(r._resource)
+    r.close()
+
+    # Pretend the resource has been idle for longer than idle_timeout.
+    rtracker.last_returned -= 60
+
+    r2 = pool.get_resource()
+    assert r2._resource is not resource
+    assert pool.size == 1
+
+
+def test_default_hooks_warn_once():
+    """
+    Test the default ``normalize_resource()`` and ``ping()`` only warn once.
+    """
+    with warnings.catch_warnings():
+        # Constructing the pool warns about the default hooks.
+        warnings.simplefilter('ignore')
+        pool = CuttlePool(mockresource.factory, capacity=1)
+
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        for _ in range(3):
+            pool.normalize_resource(None)
+            pool.ping(None)
+
+    assert len(w) == 2
+
+
+def test_default_hooks_skipped():
+    """
+    Test the default ``normalize_resource()`` and ``ping()`` warn when the
+    pool is made and are not called by ``get_resource()``.
+    """
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        pool = CuttlePool(mockresource.factory, capacity=1)
+
+    assert len(w) == 2
+    assert 'normalize_resource()' in str(w[0].message)
+    assert 'ping()' in str(w[1].message)
+
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        pool.get_resource().close()
+        pool.get_resource().close()
+
+    assert not w
+
+
+def test_instance_hooks():
+    """Test hooks set on the pool instance are called by ``get_resource()``."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        pool = CuttlePool(mockresource.factory, capacity=1)
+
+    pinged = []
+    normalized = []
+    pool.ping = lambda resource: pinged.append(resource) or True
+    pool.normalize_resource = normalized.append
+
+    pool.get_resource().close()
+    pool.get_resource().close()
+
+    assert len(pinged) == 2
+    assert len(normalized) == 2
+
+
+def test_deprecation_warns_once(pool):
+    """Test deprecated methods warn once per caller with default filters."""
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('default')
+        for _ in range(3):
+            pool.put_connection(pool.get_connection()._resource)
+
+    assert len(w) == 2
+    assert all(issubclass(x.category, DeprecationWarning) for x in w)
+    assert all(x.filename == __file__ for x in w)
+
+
+def test_deprecation_not_suppressed(pool):
+    """Test an ignored deprecation warning is raised again later."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        pool.get_connection().close()
+
+    with pytest.deprecated_call():
+        pool.get_connection().close()
 
 
 def test_put_resource(pool):
@@ -324,10 +639,10 @@ def test_put_resource(pool):
     Test that the resource is properly returned to the pool.
     """
     r = pool.get_resource()
-    r_id = id(r._resource)
+    resource = r._resource
 
-    pool.put_resource(r._resource)
-    assert id(pool.get_resource()._resource) == r_id
+    pool.put_resource(resource)
+    assert pool.get_resource()._resource is resource
 
 
 def test_with_resource(pool):
@@ -345,16 +660,10 @@ def test_with_resource(pool):
     assert r2._resource is None
 
 
-def test_resource_available(pool, rtracker):
-    """
-    Test a resource is properly tracked by a ``_ResourceTracker`` instance.
-    """
-    assert rtracker.available()
-    r = rtracker.wrap_resource(pool, Resource)
-    assert not rtracker.available()
-    del r
-    gc.collect()
-    assert rtracker.available()
+def test_resource_tracker_slots(rtracker):
+    """Test ``_ResourceTracker`` does not have an instance dictionary."""
+    with pytest.raises(AttributeError):
+        rtracker.__dict__
 
 
 def test_wrap_resource(pool, rtracker):
@@ -371,12 +680,50 @@ def test_resource_getattr_setattr(resource):
     """Test that attributes are set on the underlying resource object."""
     resource.one = 1
     assert resource.one == 1
-    assert 'one' not in resource.__dict__
+    with pytest.raises(AttributeError):
+        object.__getattribute__(resource, 'one')
     assert resource._resource.one == 1
     assert 'one' in resource._resource.__dict__
     assert resource.one == resource._resource.one
 
 
+def test_resource_subclass_setattr(pool):
+    """Test attributes a subclass stores on the wrapper stay on the wrapper."""
+    class CountResource(Resource):
+        def __init__(self, resource, pool):
+            super(CountResource, self).__init__(resource, pool)
+            object.__setattr__(self, 'count', 0)
+
+    r = pool.get_resource(CountResource)
+    r.count += 1
+    r.one = 1
+
+    assert r.__dict__ == {'count': 1}
+    assert not hasattr(r._resource, 'count')
+    assert r._resource.one == 1
+
+
+def test_resource_getattr_uninitialized():
+    """Test attribute lookup on an uninitialized Resource does not recurse."""
+    r = Resource.__new__(Resource)
+    with pytest.raises(AttributeError):
+        r.one
+
+
+def test_pool_connection_slots(pool):
+    """
+    Test ``PoolConnection`` sets attributes on the resource like ``Resource``.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        r = pool.get_resource(PoolConnection)
+
+    r.one = 1
+    assert r._resource.one == 1
+    with pytest.raises(AttributeError):
+        object.__getattribute__(r, '__dict__')
+
+
 def test_close(pool):
     """Test the close method of a Resource object."""
     r = pool.get_resource()
@@ -415,4 +762,4 @@ def test_recycling(pool):
     for t in threads:
         t.join()
 
-    assert pool._available == pool.size == pool.capacity
+    assert len(pool._idle) == pool.size == pool.capacity